@@ -5,25 +5,154 @@
 
 from dotenv import load_dotenv
 import os
+import functools
+import importlib.util
 from google import genai
+from google.genai import types
+import httpx
 
-load_dotenv()  # Loads .env file variables into environment
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-
+import asyncio
+import contextlib
 import json
 import csv
+import hashlib
+import logging
+import multiprocessing
+import queue
+import sys
+import random
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from io import BytesIO
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Union
 
 # Image processing libraries
-from PIL import Image, ImageEnhance
+from PIL import Image, ImageEnhance, ImageStat
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional fast JPEG encoder (libjpeg-turbo), used only when "simplejpeg_encoder" is enabled
+try:
+    import numpy as np
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+# Optional AVIF support for Pillow versions without a built-in AVIF codec
+try:
+    import pillow_avif  # noqa: F401 (registers the AVIF plugin)
+except ImportError:
+    pass
+
+# Optional GPU JPEG decode (nvJPEG via torchvision), used when a CUDA device is present
+try:
+    import torch
+    import torchvision
+except ImportError:
+    torch = None
+
+
+# Gemini client singleton; built on first use by get_gemini_client (lock-guarded so threads share one)
+_gemini_client: Optional[genai.Client] = None
+_gemini_client_lock = threading.Lock()
 
-# Data handling
-import pandas as pd
+
+def get_gemini_client() -> genai.Client:
+    """
+    Create the Gemini client on first use, so importing this module needs no API key.
+    The single client keeps one pooled httpx transport (HTTP/2 when `h2` is installed)
+    so concurrent description requests reuse TCP+TLS connections.
+    """
+    global _gemini_client
+    if _gemini_client is None:
+        with _gemini_client_lock:
+            if _gemini_client is None:
+                load_dotenv()  # Loads .env file variables into environment
+                http_options = types.HttpOptions(
+                    timeout=60_000,
+                    client_args={
+                        "http2": importlib.util.find_spec("h2") is not None,
+                        "limits": httpx.Limits(max_connections=32, max_keepalive_connections=32),
+                    },
+                )
+                _gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=http_options)
+    return _gemini_client
+
+
+@dataclass
+class PropertyImage:
+    """A downloaded image shared across stages, so it is read from disk and decoded at most once."""
+    path: str
+    raw_bytes: Optional[bytes] = None
+    property_id: Optional[str] = None
+    pil: Optional[Image.Image] = None
+    pil_draft_size: Optional[Tuple[int, int]] = None  # draft size `pil` was decoded for; None = full size
+
+    @classmethod
+    def of(cls, image: Union[str, "PropertyImage"]) -> "PropertyImage":
+        """Wrap a plain file path; PropertyImage instances are returned unchanged."""
+        return image if isinstance(image, cls) else cls(image)
+
+    def header_size(self) -> Tuple[int, int]:
+        """Width and height read from the file header, without decoding any pixels."""
+        with Image.open(BytesIO(self.raw_bytes) if self.raw_bytes is not None else self.path) as header:
+            return header.size
+
+    def output_stem(self) -> str:
+        """
+        File stem for processed outputs. Every property numbers its downloads image_0, image_1, ...,
+        so the property id (set by fetch_image) is prefixed to keep properties apart.
+        """
+        stem = Path(self.path).stem
+        return f"{self.property_id}_{stem}" if self.property_id else stem
+
+    def covers(self, draft_size: Optional[Tuple[int, int]]) -> bool:
+        """Check whether the cached decode is at least as large as `draft_size` asks for."""
+        if self.pil is None:
+            return False
+        if self.pil_draft_size is None:
+            return True
+        if draft_size is None:
+            return False
+        return draft_size[0] <= self.pil_draft_size[0] and draft_size[1] <= self.pil_draft_size[1]
+
+    def open(self, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        Decode the image (from raw_bytes when present), reusing the cached decode when it was
+        made for an equal or larger `draft_size`, and re-decoding when a larger one is requested.
+        """
+        if not self.covers(draft_size):
+            img = Image.open(BytesIO(self.raw_bytes) if self.raw_bytes is not None else self.path)
+            if draft_size:
+                img.draft("RGB", draft_size)
+            img.load()
+            self.pil, self.pil_draft_size = img, draft_size
+        return self.pil
+
+
+@functools.lru_cache(maxsize=256)
+def _hashtag_slug(text: str) -> str:
+    """Turn a property type into a hashtag body, e.g. '2-Bedroom Condo' -> '2-bedroomcondo'."""
+    return text.lower().replace(' ', '')
+
+
+class _LogListHandler(logging.Handler):
+    """Append formatted log records to an in-memory list (the workflow report log)."""
+
+    def __init__(self, entries: List[str]):
+        super().__init__()
+        self.entries = entries
+
+    def emit(self, record: logging.LogRecord):
+        self.entries.append(self.format(record))
 
 
 class PropertyImageProcessor:
@@ -31,12 +160,53 @@ class PropertyImageProcessor:
     Main class to handle property image automation workflow.
     """
 
-    def __init__(self, config_path: str = None):
-        """Initialize the processor with configuration."""
-        self.config = self.load_config(config_path)
+    GEMINI_MODEL = "gemini-2.5-pro"
+    # Output format -> (file extension, default quality); set per platform via "format"
+    IMAGE_FORMATS = {"JPEG": (".jpg", 85), "WEBP": (".webp", 80), "AVIF": (".avif", 60)}
+    DESCRIPTION_PROMPT = "Describe the property in this image as a compelling social post (max 100 words)."
+
+    def __init__(self, config_path: str = None, config: Optional[Dict] = None):
+        """Initialize the processor with configuration (a loaded `config` dict takes precedence)."""
+        self.config = config if config is not None else self.load_config(config_path)
         self.processed_images = []
         self.property_listings = []
         self.log = []
+        self.logger, self._log_queue, self._log_listener = self.create_logger()
+        self.session = self.create_session()
+        self._created_dirs = set()
+        self._gemini_semaphore = threading.BoundedSemaphore(self.config.get("gemini_workers", 8))
+        self._rate_limit_lock = threading.Lock()
+        self._next_request_time = 0.0
+
+    def create_logger(self) -> Tuple[logging.Logger, queue.Queue, QueueListener]:
+        """
+        Create a logger that hands records to a background thread, which formats them
+        and writes to stdout and self.log, keeping log_action cheap on the hot paths.
+        """
+        formatter = logging.Formatter("[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+        stdout_handler = logging.StreamHandler(sys.stdout)
+        list_handler = _LogListHandler(self.log)
+        for handler in (stdout_handler, list_handler):
+            handler.setFormatter(formatter)
+        # Unbounded: QueueHandler uses put_nowait, so a full queue would drop records
+        log_queue = queue.Queue()
+        listener = QueueListener(log_queue, stdout_handler, list_handler)
+        listener.start()
+        logger = logging.Logger(f"{__name__}.PropertyImageProcessor", logging.INFO)
+        logger.addHandler(QueueHandler(log_queue))
+        return logger, log_queue, listener
+
+    def create_session(self) -> requests.Session:
+        """Create a pooled HTTP session with retries for image downloads."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504]),
+            pool_connections=32,
+            pool_maxsize=32
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def load_config(self, config_path: Optional[str]) -> Dict:
         """Load configuration from JSON file or use defaults."""
@@ -52,149 +222,543 @@ class PropertyImageProcessor:
                 "format": "JPEG"
             },
             "platforms": {
+                # Optional per platform: "format" ("JPEG", "WEBP", "AVIF") and "quality"
                 "instagram": {"width": 1080, "height": 1350},
                 "facebook": {"width": 1200, "height": 628},
                 "linkedin": {"width": 1200, "height": 627}
             },
-            "output_dir": "./processed_properties"
+            "output_dir": "./processed_properties",
+            "download_workers": 16,
+            "gemini_workers": 8,
+            "gemini_requests_per_minute": 60,
+            "gemini_max_retries": 3,
+            "process_workers": None,
+            "use_gpu": False,
+            "gpu_batch_size": 16,
+            "simplejpeg_encoder": False
         }
 
     # ======================= LAYER 1: DATA COLLECTION =======================
 
-    def download_image(self, image_url: str, property_id: str) -> Optional[str]:
-        """Download an image from URL and save locally."""
+    def fetch_image(self, image_url: str, property_id: str, image_index: int) -> Optional[PropertyImage]:
+        """
+        Download an image, save it as image_<image_index>.jpg, and return it with its in-memory bytes.
+        Indices come from the URL's position (see image_jobs), so names are stable across runs.
+        """
         try:
-            response = requests.get(image_url, timeout=10)
+            response = self.session.get(image_url, timeout=10)
             response.raise_for_status()
-            output_dir = os.path.join(self.config["output_dir"], property_id, "raw")
-            os.makedirs(output_dir, exist_ok=True)
-            file_path = os.path.join(output_dir, f"image_{len(os.listdir(output_dir))}.jpg")
+            data: bytes = response.content
+            file_path = os.path.join(self.raw_dir(property_id), f"image_{image_index}.jpg")
             with open(file_path, 'wb') as f:
-                f.write(response.content)
+                f.write(data)
             self.log_action(f"Downloaded image: {file_path}")
-            return file_path
+            return PropertyImage(file_path, data, property_id)
         except Exception as e:
             self.log_action(f"ERROR downloading {image_url}: {str(e)}")
             return None
 
-    def collect_property_images(self, property_data: List[Dict]) -> List[str]:
-        """Collect multiple property images from URLs."""
-        downloaded_paths = []
+    def download_image(self, image_url: str, property_id: str) -> Optional[str]:
+        """Download an image from URL and save locally."""
+        output_dir = self.ensure_dir(self.raw_dir(property_id))
+        fetched = self.fetch_image(image_url, property_id, len(os.listdir(output_dir)))
+        return fetched.path if fetched else None
+
+    def ensure_dir(self, path: str) -> str:
+        """Create a directory once per processor; later calls skip the stat + mkdir."""
+        if path not in self._created_dirs:
+            Path(path).mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(path)
+        return path
+
+    def raw_dir(self, property_id: str) -> str:
+        """Directory for a property's downloaded images."""
+        return os.path.join(self.config["output_dir"], property_id, "raw")
+
+    def platform_dir(self, platform: str) -> str:
+        """Directory for a platform's processed images."""
+        return os.path.join(self.config["output_dir"], "platform_optimized", platform)
+
+    def create_raw_dirs(self, jobs: List[Tuple[str, str]]):
+        """Create the raw image directory for every property in a download batch up front."""
+        for property_id in dict.fromkeys(property_id for property_id, _, _ in jobs):
+            self.ensure_dir(self.raw_dir(property_id))
+
+    def create_platform_dirs(self):
+        """Create every platform output directory up front."""
+        for platform in self.config["platforms"]:
+            self.ensure_dir(self.platform_dir(platform))
+
+    def image_jobs(self, property_data: List[Dict]) -> List[Tuple[str, int, str]]:
+        """
+        Flatten property data into (property_id, image_index, image_url); indices follow URL order.
+        Properties without an id are logged and skipped, since their images have nowhere to go.
+        """
+        next_index: Dict[str, int] = {}
+        jobs = []
         for prop in property_data:
             prop_id = prop.get('id')
             image_urls = prop.get('image_urls', [])
+            if not prop_id:
+                if image_urls:
+                    self.log_action(f"ERROR skipping {len(image_urls)} image(s): property has no id")
+                continue
             for url in image_urls:
-                file_path = self.download_image(url, prop_id)
-                if file_path:
-                    downloaded_paths.append({
-                        'property_id': prop_id,
-                        'file_path': file_path,
-                        'url': url
-                    })
+                index = next_index.get(prop_id, 0)
+                next_index[prop_id] = index + 1
+                jobs.append((prop_id, index, url))
+        return jobs
+
+    def collect_property_images(self, property_data: List[Dict]) -> List[Dict]:
+        """
+        Collect multiple property images from URLs (downloaded concurrently).
+        Each entry keeps the downloaded bytes under 'data' and the PropertyImage under 'image',
+        so later stages skip re-reading the file.
+        """
+        jobs = self.image_jobs(property_data)
+        self.create_raw_dirs(jobs)
+        max_workers = self.config.get("download_workers", 16)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = list(executor.map(lambda job: self.fetch_image(job[2], job[0], job[1]), jobs))
+        downloaded_paths = []
+        for (prop_id, _, url), image in zip(jobs, fetched):
+            if image:
+                downloaded_paths.append({
+                    'property_id': prop_id,
+                    'file_path': image.path,
+                    'url': url,
+                    'data': image.raw_bytes,
+                    'image': image
+                })
         return downloaded_paths
 
     # ======================= LAYER 2: IMAGE PROCESSING =======================
 
-    def resize_image(self, image_path: str, target_width: int, target_height: int = None) -> Image.Image:
-        """Resize image maintaining aspect ratio."""
-        img = Image.open(image_path)
+    def resize_image(self, image_path: Union[str, PropertyImage], target_width: int,
+                     target_height: int = None) -> Image.Image:
+        """
+        Resize image maintaining aspect ratio (LANCZOS; SIMD-accelerated under Pillow-SIMD).
+        JPEGs are draft-decoded with libjpeg's DCT scaling (1/2, 1/4, 1/8) to the smallest scale
+        that is still at least the target size, so large sources skip most of the full decode.
+        """
+        image = PropertyImage.of(image_path)
         if target_height is None:
-            ratio = target_width / img.size[0]
-            target_height = int(img.size[1] * ratio)
+            width, height = image.header_size()
+            target_height = int(height * target_width / width)
+        img = image.open(draft_size=(target_width, target_height))
         img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-        self.log_action(f"Resized image: {image_path} to {target_width}x{target_height}")
+        self.log_action(f"Resized image: {image.path} to {target_width}x{target_height}")
         return img
 
-    def compress_image(self, img: Image.Image, quality: int = 85) -> Image.Image:
-        """Compress image while maintaining quality."""
-        self.log_action(f"Compressed image with quality: {quality}")
-        return img
+    def save_jpeg(self, img: Image.Image, output_path: str, quality: int = 85):
+        """
+        Encode and save a JPEG. Pillow with Huffman optimisation is the default; simplejpeg is
+        opt-in ("simplejpeg_encoder") as it has no optimize pass and files come out ~20% larger.
+        """
+        if simplejpeg is None or not self.config.get("simplejpeg_encoder", False):
+            img.save(output_path, "JPEG", quality=quality, optimize=True)
+            return
+        # 4:2:0 matches Pillow's subsampling at this quality; simplejpeg defaults to 4:4:4
+        data = simplejpeg.encode_jpeg(
+            np.ascontiguousarray(img.convert("RGB")), quality=quality, colorspace="RGB", colorsubsampling="420"
+        )
+        with open(output_path, 'wb') as f:
+            f.write(data)
+
+    def save_image(self, img: Image.Image, output_stem: str, image_format: str = "JPEG",
+                   quality: Optional[int] = None) -> str:
+        """Save an image as JPEG, WEBP or AVIF and return the path (extension added from the format)."""
+        extension, default_quality = self.IMAGE_FORMATS[image_format.upper()]
+        quality = quality or default_quality
+        output_path = output_stem + extension
+        if extension == ".jpg":
+            self.save_jpeg(img, output_path, quality=quality)
+        elif extension == ".webp":
+            img.save(output_path, "WEBP", quality=quality, method=6)
+        else:
+            img.save(output_path, "AVIF", quality=quality)
+        return output_path
+
+    @staticmethod
+    def blend_table(factor: float, pivot: int = 0) -> List[int]:
+        """
+        Per-channel table for Image.blend(solid `pivot`, img, factor). Pillow's C code works in
+        single-precision floats and truncates, so both are reproduced here.
+        """
+        def f32(value: float) -> float:
+            return struct.unpack("f", struct.pack("f", value))[0]
+
+        alpha = f32(factor)
+        return [
+            min(255, max(0, int(f32(pivot + f32(alpha * (value - pivot))))))
+            for value in range(256)
+        ]
+
+    def tone_lut(self, img: Image.Image, brightness: float, contrast: float) -> List[int]:
+        """
+        Build an RGB lookup table matching ImageEnhance.Brightness followed by Contrast exactly.
+        Contrast pivots on the mean grey level of the brightened image, as ImageEnhance does; that
+        image is only used for the statistic, the caller applies the composed table in one pass.
+        """
+        bright = self.blend_table(brightness)
+        grey = img.point(bright * 3).convert("L")
+        mean = int(ImageStat.Stat(grey).mean[0] + 0.5)
+        contrasted = self.blend_table(contrast, mean)
+        return [contrasted[value] for value in bright] * 3
 
     def enhance_image(self, img: Image.Image) -> Image.Image:
-        """Enhance image: brightness, contrast, sharpness."""
-        enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(1.05)
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.1)
+        """Enhance image: brightness + contrast as one LUT pass, then sharpness."""
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img = img.point(self.tone_lut(img, brightness=1.05, contrast=1.1))
         enhancer = ImageEnhance.Sharpness(img)
         img = enhancer.enhance(1.2)
         self.log_action("Enhanced image: brightness, contrast, sharpness")
         return img
 
-    def process_image_for_platform(self, image_path: str, platform: str) -> Optional[str]:
-        """Process image optimized for specific social media platform."""
+    def source_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        Smallest size keeping the image's own aspect ratio that still covers every platform's width
+        and height (never larger than the original); sources are prepared at this size.
+        """
+        width, height = size
+        scale = min(1.0, max(max(d["width"] / width, d["height"] / height)
+                             for d in self.config["platforms"].values()))
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def prepare_source_image(self, image_path: Union[str, PropertyImage]) -> Image.Image:
+        """Decode an image once and enhance it at its source size (see source_size)."""
+        image = PropertyImage.of(image_path)
+        width, height = self.source_size(image.header_size())
+        img = self.resize_image(image, width, height)
+        return self.enhance_image(img)
+
+    def gpu_available(self) -> bool:
+        """
+        Check whether GPU decoding is enabled ("use_gpu", off by default) and a CUDA device is present.
+        The GPU resize is bilinear rather than LANCZOS, so output differs slightly from the CPU path.
+        """
+        return torch is not None and self.config.get("use_gpu", False) and torch.cuda.is_available()
+
+    def decode_images_gpu(self, images: List[PropertyImage]) -> List[Image.Image]:
+        """
+        Decode one chunk of JPEGs with nvJPEG and resize each on the GPU to its source size.
+        Callers keep chunks to "gpu_batch_size" so full-resolution tensors fit in GPU memory.
+        """
+        data = [
+            torch.frombuffer(bytearray(image.raw_bytes), dtype=torch.uint8)
+            if image.raw_bytes is not None else torchvision.io.read_file(image.path)
+            for image in images
+        ]
+        decoded = torchvision.io.decode_jpeg(data, mode=torchvision.io.ImageReadMode.RGB, device="cuda")
+        sources = []
+        for tensor in decoded:
+            width, height = self.source_size((tensor.shape[2], tensor.shape[1]))
+            resized = torch.nn.functional.interpolate(
+                tensor.unsqueeze(0).float(), size=(height, width), mode="bilinear", antialias=True
+            )
+            pixels = resized.squeeze(0).clamp(0, 255).to(torch.uint8).permute(1, 2, 0).cpu().numpy()
+            sources.append(Image.fromarray(pixels))
+        self.log_action(f"Decoded {len(sources)} images on GPU (nvJPEG)")
+        return sources
+
+    def process_image_for_platform(self, image_path: Union[str, PropertyImage], platform: str,
+                                   dimensions: Optional[Dict] = None,
+                                   source: Optional[Image.Image] = None) -> Optional[str]:
+        """
+        Process image optimized for specific social media platform.
+        Pass `dimensions` to skip the config lookup, and a `source` from prepare_source_image
+        to reuse one decode + enhance across platforms.
+        """
         try:
-            dimensions = self.config["platforms"].get(platform)
+            if dimensions is None:
+                dimensions = self.config["platforms"].get(platform)
             if not dimensions:
                 self.log_action(f"Unknown platform: {platform}")
                 return None
-            img = self.resize_image(image_path, dimensions["width"], dimensions["height"])
-            img = self.enhance_image(img)
-            img = self.compress_image(img, quality=85)
-            output_dir = os.path.join(self.config["output_dir"], "platform_optimized", platform)
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"{Path(image_path).stem}_{platform}.jpg")
-            img.save(output_path, "JPEG", quality=85, optimize=True)
+            if source is None:
+                source = self.prepare_source_image(image_path)
+            img = source.resize((dimensions["width"], dimensions["height"]), Image.Resampling.LANCZOS)
+            output_path = self.save_image(
+                img,
+                os.path.join(self.ensure_dir(self.platform_dir(platform)), f"{PropertyImage.of(image_path).output_stem()}_{platform}"),
+                dimensions.get("format", "JPEG"),
+                dimensions.get("quality")
+            )
             self.log_action(f"Processed for {platform}: {output_path}")
             return output_path
         except Exception as e:
             self.log_action(f"ERROR processing for {platform}: {str(e)}")
             return None
 
-    def batch_process_images(self, image_paths: List[str]) -> Dict[str, List[str]]:
-        """Batch process images for all platforms."""
-        results = {platform: [] for platform in self.config["platforms"].keys()}
-        for image_path in image_paths:
-            for platform in self.config["platforms"].keys():
-                processed = self.process_image_for_platform(image_path, platform)
-                if processed:
-                    results[platform].append(processed)
+    def unique_output_images(self, image_paths: List[Union[str, PropertyImage]]) -> List[PropertyImage]:
+        """
+        Wrap inputs as PropertyImages, dropping any whose output name is already taken in the batch,
+        so parallel workers never write the same file.
+        """
+        images, seen = [], set()
+        for image in map(PropertyImage.of, image_paths):
+            stem = image.output_stem()
+            if stem in seen:
+                self.log_action(f"ERROR skipping {image.path}: output name {stem} is already used in this batch")
+                continue
+            seen.add(stem)
+            images.append(image)
+        return images
+
+    def create_process_pool(self) -> ProcessPoolExecutor:
+        """Process pool for image work, with one processor per worker built from this config."""
+        # Spawn, not fork: this can run while log, download or Gemini threads are alive (e.g. from run_pipeline)
+        return ProcessPoolExecutor(max_workers=self.config.get("process_workers") or os.cpu_count(),
+                                   mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_process_worker, initargs=(self.config,))
+
+    def submit_gpu_batch(self, executor: ProcessPoolExecutor, images: List[PropertyImage]) -> List[Future]:
+        """
+        Decode a chunk of images on the GPU and submit enhance + encode for each to the pool.
+        If the GPU decode fails the chunk is submitted for the normal CPU path instead.
+        """
+        try:
+            sources = self.decode_images_gpu(images)
+        except Exception as e:
+            self.log_action(f"GPU decode failed, processing {len(images)} image(s) on CPU: {str(e)}")
+            return [executor.submit(_process_one, image) for image in images]
+        return [executor.submit(_process_one, image, source) for image, source in zip(images, sources)]
+
+    def batch_process_images(self, image_paths: List[Union[str, PropertyImage]]) -> Dict[str, List[str]]:
+        """
+        Batch process images for all platforms, one image per worker process.
+        Passing PropertyImage entries (e.g. 'image' from collect_property_images) skips re-reading files.
+        With "use_gpu", decoding happens on the GPU in chunks and enhance + encode stays on the pool.
+        """
+        images = self.unique_output_images(image_paths)
+        self.create_platform_dirs()
+        results = {platform: [] for platform in self.config["platforms"]}
+        self.flush_log()
+        with self.create_process_pool() as executor:
+            if images and self.gpu_available():
+                batch_size = self.config.get("gpu_batch_size", 16)
+                futures = []
+                for start in range(0, len(images), batch_size):
+                    futures.extend(self.submit_gpu_batch(executor, images[start:start + batch_size]))
+                outputs = (future.result() for future in futures)
+            else:
+                outputs = executor.map(_process_one, images)
+            for processed, worker_log in outputs:
+                self.log.extend(worker_log)
+                for platform, output_path in processed.items():
+                    if output_path:
+                        results[platform].append(output_path)
         return results
 
     # ======================= LAYER 3: AI DESCRIPTION GENERATION =======================
 
-    def generate_description_gemini(self, image_path: str) -> Optional[str]:
+    def wait_for_rate_limit(self):
+        """Block until the next Gemini request slot is available (requests per minute)."""
+        interval = 60.0 / self.config.get("gemini_requests_per_minute", 60)
+        with self._rate_limit_lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_request_time - now)
+            self._next_request_time = max(now, self._next_request_time) + interval
+        if wait:
+            time.sleep(wait)
+
+    @staticmethod
+    def is_rate_limit_error(error: Exception) -> bool:
+        """Check whether a Gemini error is a 429 / RESOURCE_EXHAUSTED."""
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        return code == 429 or "RESOURCE_EXHAUSTED" in str(error).upper()
+
+    def call_gemini_with_backoff(self, **request):
+        """Call Gemini under the concurrency/rate limits, retrying 429s with exponential backoff."""
+        max_retries = self.config.get("gemini_max_retries", 3)
+        base_delay, max_delay, jitter = 1.0, 30.0, 1.0
+        for attempt in range(max_retries + 1):
+            self.wait_for_rate_limit()
+            try:
+                with self._gemini_semaphore:
+                    return get_gemini_client().models.generate_content(**request)
+            except Exception as e:
+                if attempt >= max_retries or not self.is_rate_limit_error(e):
+                    raise
+                delay = min(max_delay, base_delay * 2 ** attempt) + random.uniform(0, jitter)
+                self.log_action(f"Gemini rate limited, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+                time.sleep(delay)
+
+    def description_cache_path(self, image_bytes: bytes) -> str:
+        """Cache file for a description, keyed on model + prompt + image bytes."""
+        key = hashlib.sha256(
+            self.GEMINI_MODEL.encode() + self.DESCRIPTION_PROMPT.encode() + image_bytes
+        ).hexdigest()
+        return os.path.join(self.config["output_dir"], ".desc_cache", f"{key}.txt")
+
+    def save_cached_description(self, cache_path: str, description: str):
+        """Write a description to the cache atomically (tmpfile + rename); failures are logged, not raised."""
+        tmp_path = None
+        try:
+            cache_dir = os.path.dirname(cache_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=cache_dir, suffix=".tmp",
+                                             delete=False) as tmp:
+                tmp_path = tmp.name
+                tmp.write(description)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            self.log_action(f"ERROR caching description {cache_path}: {str(e)}")
+            if tmp_path:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+    def generate_description_gemini(self, image_path: str, image_bytes: Optional[bytes] = None) -> Optional[str]:
         """
         Generate property description using Gemini Vision API.
+        Pass `image_bytes` (e.g. from collect_property_images) to skip reading the file again.
+        Results are cached on disk by content hash, so unchanged images skip the API call.
         """
         try:
-            response = gemini_client.models.generate_content(
-                model="gemini-2.5-pro",
+            if image_bytes is None:
+                with open(image_path, "rb") as f:
+                    image_bytes = f.read()
+            cache_path = self.description_cache_path(image_bytes)
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    description = f.read()
+                self.log_action(f"Cached description (Gemini): {description[:50]}...")
+                return description
+            response = self.call_gemini_with_backoff(
+                model=self.GEMINI_MODEL,
                 contents=[{
                     "role": "user",
                     "parts": [
                         {
-                            "text": "Describe the property in this image as a compelling social post (max 100 words)."
+                            "text": self.DESCRIPTION_PROMPT
                         },
                         {
-                            "inline_data": {"mime_type": "image/jpeg", "data": open(image_path, "rb").read()}
+                            "inline_data": {"mime_type": "image/jpeg", "data": image_bytes}
                         }
                     ]
                 }]
             )
             description = response.candidates[0].content.parts[0].text
+            self.save_cached_description(cache_path, description)
             self.log_action(f"Generated description (Gemini): {description[:50]}...")
             return description
         except Exception as e:
             self.log_action(f"ERROR generating description (Gemini): {str(e)}")
             return None
 
-    def generate_description(self, image_path: str) -> Optional[str]:
+    def generate_description(self, image_path: str, image_bytes: Optional[bytes] = None) -> Optional[str]:
         """
         Generate description using Gemini API only.
         """
-        return self.generate_description_gemini(image_path)
+        return self.generate_description_gemini(image_path, image_bytes)
 
-    # ======================= LAYER 4: CONTENT PREPARATION =======================
+    def generate_descriptions(self, image_paths: List[str],
+                              image_bytes: Optional[List[bytes]] = None) -> List[Optional[str]]:
+        """Generate descriptions for many images concurrently, preserving input order."""
+        if image_bytes is None:
+            image_bytes = [None] * len(image_paths)
+        with ThreadPoolExecutor(max_workers=self.config.get("gemini_workers", 8)) as executor:
+            return list(executor.map(self.generate_description, image_paths, image_bytes))
 
-    def create_social_media_posts(self, description: str, property_info: Dict) -> Dict[str, str]:
-        """Create platform-specific social media posts from description."""
-        posts = {}
-        price = property_info.get("price", "Contact for price")
-        address = property_info.get("address", "New Listing")
-        prop_type = property_info.get("type", "Property")
+    # ======================= PIPELINE: LAYERS 1-3 =======================
+
+    def run_pipeline(self, property_data: List[Dict]) -> Tuple[List[Dict], Dict[str, List[str]], List[Optional[str]]]:
+        """
+        Run download, processing and description as overlapping stages: each image is
+        processed and described as soon as it is downloaded, instead of phase by phase.
+        Returns what collect_property_images, batch_process_images and generate_descriptions
+        would, with descriptions aligned to the downloaded images.
+        """
+        return asyncio.run(self._run_pipeline(property_data))
+
+    async def _run_pipeline(self, property_data: List[Dict]):
+        loop = asyncio.get_running_loop()
+        jobs = self.image_jobs(property_data)
+        self.create_raw_dirs(jobs)
+        self.create_platform_dirs()
+        use_gpu = self.gpu_available()
+        process_workers = self.config.get("process_workers") or os.cpu_count()
+        process_consumers = 1 if use_gpu else process_workers
+        gemini_workers = self.config.get("gemini_workers", 8)
+        to_process = asyncio.Queue(maxsize=2 * process_workers)
+        to_describe = asyncio.Queue(maxsize=2 * gemini_workers)
+        downloaded: Dict[int, Dict] = {}
+        processed: Dict[int, Dict[str, Optional[str]]] = {}
+        descriptions: Dict[int, Optional[str]] = {}
+
+        async def download(index: int, prop_id: str, image_index: int, url: str):
+            image = await loop.run_in_executor(download_pool, self.fetch_image, url, prop_id, image_index)
+            if image:
+                downloaded[index] = {
+                    'property_id': prop_id, 'file_path': image.path, 'url': url,
+                    'data': image.raw_bytes, 'image': image
+                }
+                await to_process.put((index, image))
+                await to_describe.put((index, image))
+
+        async def download_stage():
+            await asyncio.gather(*(download(i, *job) for i, job in enumerate(jobs)))
+            for _ in range(process_consumers):
+                await to_process.put(None)
+            for _ in range(gemini_workers):
+                await to_describe.put(None)
+
+        async def process_stage():
+            while (item := await to_process.get()) is not None:
+                index, image = item
+                result, worker_log = await loop.run_in_executor(process_pool, _process_one, image)
+                self.log.extend(worker_log)
+                processed[index] = result
+
+        async def process_gpu_chunk(chunk: List[Tuple[int, PropertyImage]]):
+            futures = await loop.run_in_executor(decode_pool, self.submit_gpu_batch,
+                                                 process_pool, [image for _, image in chunk])
+            for (index, _), future in zip(chunk, futures):
+                result, worker_log = await asyncio.wrap_future(future)
+                self.log.extend(worker_log)
+                processed[index] = result
+
+        async def process_stage_gpu():
+            # nvJPEG decodes in batches: hand off each chunk as soon as it fills, while downloads continue
+            batch_size = self.config.get("gpu_batch_size", 16)
+            chunk, chunks = [], []
+            while (item := await to_process.get()) is not None:
+                chunk.append(item)
+                if len(chunk) == batch_size:
+                    chunks.append(asyncio.ensure_future(process_gpu_chunk(chunk)))
+                    chunk = []
+            if chunk:
+                chunks.append(asyncio.ensure_future(process_gpu_chunk(chunk)))
+            await asyncio.gather(*chunks)
+
+        async def describe_stage():
+            while (item := await to_describe.get()) is not None:
+                index, image = item
+                descriptions[index] = await loop.run_in_executor(
+                    gemini_pool, self.generate_description, image.path, image.raw_bytes
+                )
+
+        self.flush_log()
+        # One decoding thread keeps a single chunk on the GPU at a time
+        with ThreadPoolExecutor(max_workers=self.config.get("download_workers", 16)) as download_pool, \
+                ThreadPoolExecutor(max_workers=gemini_workers) as gemini_pool, \
+                ThreadPoolExecutor(max_workers=1) as decode_pool, self.create_process_pool() as process_pool:
+            processing = [process_stage_gpu()] if use_gpu else [process_stage() for _ in range(process_workers)]
+            await asyncio.gather(download_stage(), *processing, *(describe_stage() for _ in range(gemini_workers)))
+
+        order = sorted(downloaded)
+        results = {platform: [] for platform in self.config["platforms"]}
+        for index in order:
+            for platform, output_path in processed.get(index, {}).items():
+                if output_path:
+                    results[platform].append(output_path)
+        return [downloaded[i] for i in order], results, [descriptions.get(i) for i in order]
+
+    # ======================= LAYER 4: CONTENT PREPARATION =======================
 
-        posts["instagram"] = f"""{description}
+    POST_TEMPLATES = {
+        "instagram": """{description}
 
 📍 {address}
 💰 {price}
@@ -203,9 +767,9 @@ class PropertyImageProcessor:
 DM for more details! 📞
 .
 .
-#realestate #propertylisting #luxury #homeforsale #{prop_type.lower().replace(' ', '')} #realestateagent #newhome"""
+#realestate #propertylisting #luxury #homeforsale #{type_tag} #realestateagent #newhome""",
 
-        posts["facebook"] = f"""🏡 New Listing Alert! 🏡
+        "facebook": """🏡 New Listing Alert! 🏡
 
 {description}
 
@@ -214,9 +778,9 @@ DM for more details! 📞
 🏘️ Type: {prop_type}
 
 Contact us today to schedule a showing!
-Schedule your tour now →"""
+Schedule your tour now →""",
 
-        posts["linkedin"] = f"""Exciting New Property Listing!
+        "linkedin": """Exciting New Property Listing!
 
 {description}
 
@@ -225,19 +789,31 @@ Professional Details:
 • Investment Value: {price}
 • Category: {prop_type}
 
-#RealEstate #PropertyInvestment #CommercialRealEstate #DreamHome"""
+#RealEstate #PropertyInvestment #CommercialRealEstate #DreamHome""",
 
-        posts["twitter"] = f"""🏠 NEW: {prop_type} at {address}
+        "twitter": """🏠 NEW: {prop_type} at {address}
 
-{description[:100]}...
+{short_description}...
 
 💰 {price}
 
 Learn more → Link in bio 🔗
 
-#RealEstate #HomeSale"""
+#RealEstate #HomeSale""",
+    }
 
-        return posts
+    def create_social_media_posts(self, description: str, property_info: Dict) -> Dict[str, str]:
+        """Create platform-specific social media posts from description."""
+        prop_type = property_info.get("type", "Property")
+        fields = {
+            "description": description,
+            "short_description": description[:100],
+            "price": property_info.get("price", "Contact for price"),
+            "address": property_info.get("address", "New Listing"),
+            "prop_type": prop_type,
+            "type_tag": _hashtag_slug(prop_type),
+        }
+        return {platform: template.format_map(fields) for platform, template in self.POST_TEMPLATES.items()}
 
     # ======================= LAYER 5: AUTOMATION & OUTPUT =======================
 
@@ -246,37 +822,85 @@ Learn more → Link in bio 🔗
         if not output_path:
             os.makedirs(self.config["output_dir"], exist_ok=True)
             output_path = os.path.join(self.config["output_dir"], "listings_export.csv")
-        df = pd.DataFrame(listings_data)
-        df.to_csv(output_path, index=False)
+        fieldnames = list(dict.fromkeys(key for row in listings_data for key in row))
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(listings_data)
         self.log_action(f"Exported CSV: {output_path}")
         return output_path
 
     def log_action(self, message: str):
-        """Log workflow actions."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        self.log.append(log_entry)
-        print(log_entry)
+        """Log workflow actions (formatted and printed by the background log thread)."""
+        self.logger.info(message)
+
+    def flush_log(self):
+        """Block until every queued log entry has been written to stdout and self.log."""
+        self._log_queue.join()
+
+    def close(self):
+        """Flush pending log entries and stop the background log thread."""
+        self._log_listener.stop()
 
     def save_workflow_report(self, output_path: str = None) -> str:
         """Save complete workflow report."""
         if not output_path:
             os.makedirs(self.config["output_dir"], exist_ok=True)
             output_path = os.path.join(self.config["output_dir"], "workflow_report.txt")
+        self.flush_log()
+        entries = "".join(f"{log_entry}\n" for log_entry in self.log)
+        report = (
+            "PROPERTY IMAGE AUTOMATION - WORKFLOW REPORT\n"
+            f"Generated: {datetime.now().isoformat()}\n"
+            f"{'=' * 60}\n\n"
+            "LOG ENTRIES:\n"
+            f"{'-' * 60}\n"
+            f"{entries}"
+            f"\n{'=' * 60}\n"
+            f"Total Entries: {len(self.log)}\n"
+        )
         with open(output_path, 'w') as f:
-            f.write("PROPERTY IMAGE AUTOMATION - WORKFLOW REPORT\n")
-            f.write(f"Generated: {datetime.now().isoformat()}\n")
-            f.write("=" * 60 + "\n\n")
-            f.write("LOG ENTRIES:\n")
-            f.write("-" * 60 + "\n")
-            for log_entry in self.log:
-                f.write(log_entry + "\n")
-            f.write("\n" + "=" * 60 + "\n")
-            f.write(f"Total Entries: {len(self.log)}\n")
+            f.write(report)
         self.log_action(f"Report saved: {output_path}")
         return output_path
 
 
+# ======================= PROCESS POOL WORKERS =======================
+
+_worker_processor: Optional[PropertyImageProcessor] = None
+_worker_platforms: Tuple[Tuple[str, Dict], ...] = ()
+
+
+def _init_process_worker(config: Dict):
+    """Create one processor per worker process for batch_process_images."""
+    global _worker_processor, _worker_platforms
+    _worker_processor = PropertyImageProcessor(config=config)
+    _worker_platforms = tuple(config["platforms"].items())
+
+
+def _process_one(image_path: Union[str, PropertyImage], decoded: Optional[Image.Image] = None):
+    """
+    Decode + enhance one image and write it for every platform (runs in a worker process).
+    `decoded` is a source already decoded and resized on the GPU; it only needs enhancing.
+    """
+    processor = _worker_processor
+    processor.log.clear()
+    image = PropertyImage.of(image_path)
+    processed = {}
+    try:
+        if decoded is None:
+            source = processor.prepare_source_image(image)
+        else:
+            source = processor.enhance_image(decoded)
+    except Exception as e:
+        processor.log_action(f"ERROR preparing {image.path}: {str(e)}")
+    else:
+        for platform, dimensions in _worker_platforms:
+            processed[platform] = processor.process_image_for_platform(image, platform, dimensions, source)
+    processor.flush_log()
+    return processed, list(processor.log)
+
+
 # ======================= EXAMPLE USAGE =======================
 
 if __name__ == "__main__":
@@ -302,25 +926,18 @@ if __name__ == "__main__":
         }
     ]
 
-    print("\n[LAYER 1] DATA COLLECTION")
+    print("\n[LAYERS 1-3] DATA COLLECTION, IMAGE PROCESSING & AI DESCRIPTION GENERATION (pipelined)")
     print("-" * 50)
     processor.log_action("Starting real image collection...")
-    downloaded_imgs = processor.collect_property_images(sample_properties)
+    downloaded_imgs, processed_for_platforms, generated = processor.run_pipeline(sample_properties)
 
-    print("\n[LAYER 2] IMAGE PROCESSING")
-    print("-" * 50)
-    img_paths = [img['file_path'] for img in downloaded_imgs]
-    processed_for_platforms = processor.batch_process_images(img_paths)
-
-    print("\n[LAYER 3] AI DESCRIPTION GENERATION")
-    print("-" * 50)
     descriptions = []
-    for img_path in img_paths:
-        desc = processor.generate_description(img_path)
+    for desc in generated:
         if desc is None:
             desc = "Fallback: Beautiful property with modern features."
         descriptions.append(desc)
 
+    processor.flush_log()
     print("\n[LAYER 4] CONTENT PREPARATION")
     print("-" * 50)
     posts = []
@@ -330,24 +947,31 @@ if __name__ == "__main__":
         print("\nSample Instagram Post:")
         print(post["instagram"][:200] + "...")
 
+    processor.flush_log()
     print("\n[LAYER 5] AUTOMATION & OUTPUT")
     print("-" * 50)
+    listing = sample_properties[0]
+    instagram_posts = [post["instagram"][:100] for post in posts]
+    facebook_posts = [post["facebook"][:100] for post in posts]
+    linkedin_posts = [post["linkedin"][:100] for post in posts]
     export_data = []
-    for i, desc in enumerate(descriptions):
+    for desc, instagram_post, facebook_post, linkedin_post in zip(
+            descriptions, instagram_posts, facebook_posts, linkedin_posts):
         export_data.append({
-            "property_id": sample_properties[0]["id"],
-            "address": sample_properties[0]["address"],
-            "price": sample_properties[0]["price"],
-            "type": sample_properties[0]["type"],
+            "property_id": listing["id"],
+            "address": listing["address"],
+            "price": listing["price"],
+            "type": listing["type"],
             "description": desc,
-            "instagram_post": posts[i]["instagram"][:100],
-            "facebook_post": posts[i]["facebook"][:100],
-            "linkedin_post": posts[i]["linkedin"][:100],
+            "instagram_post": instagram_post,
+            "facebook_post": facebook_post,
+            "linkedin_post": linkedin_post,
             "processing_date": datetime.now().isoformat()
         })
 
     csv_path = processor.create_csv_export(export_data)
     report_path = processor.save_workflow_report()
+    processor.close()
 
     print(f"\n✅ Workflow completed successfully!")
     print(f"📊 Report saved: {report_path}")